@@ -1,50 +1,354 @@
 import logging 
-import json
+import atexit
+import io
+import re
 import datetime
 import uuid
-from typing import Dict, Any, Optional
-import psycopg2
-from psycopg2 import sql
+import time
+import os
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
 import hashlib
+import orjson
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import psycopg
+    import psycopg_pool
+except ImportError:
+    psycopg = None
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.extras
+    import psycopg2.pool
+except ImportError:
+    psycopg2 = None
+
+# psycopg2 flushes smaller than this run the server-prepared INSERT per row; larger
+# ones amortize parsing over a multi-row VALUES statement instead
+_PREPARED_MAX_ROWS = 100
+
+# Metadata keys whose values are replaced with '[REDACTED]'
+_PII_FIELDS = frozenset({'email', 'phone', 'address', 'name', 'ssn', 'credit_card', 'password'})
+
+def _build_pii_key_scanner():
+    """Return a predicate telling whether serialized JSON contains a PII field as a quoted string"""
+    patterns = [f'"{field}"' for field in sorted(_PII_FIELDS)]
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for pattern in patterns:
+            automaton.add_word(pattern, pattern)
+        automaton.make_automaton()
+        return lambda text: next(automaton.iter(text), None) is not None
+
+    regex = re.compile('|'.join(map(re.escape, patterns)))
+    return lambda text: regex.search(text) is not None
+
+
+# Single pass over serialized metadata (an Aho-Corasick automaton when pyahocorasick
+# is installed); only payloads with a hit are walked and redacted key by key
+_contains_pii_key = _build_pii_key_scanner()
+
+# Log IDs are cut from one os.urandom read of this many bytes instead of a read per UUID
+_UUID_POOL_BYTES = 4096
+
+# Queue marker that tells the writer thread to flush and exit
+_STOP = object()
+
+
+def _dumps(obj: Any, sort: bool = False) -> bytes:
+    """Serialize to compact JSON bytes with orjson"""
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_SORT_KEYS if sort else 0)
+    return orjson.dumps(obj, option=option)
+
+
+# hashlib's OpenSSL-backed constructor; OpenSSL >= 1.1.1 picks the SHA-NI code
+# path at runtime on CPUs that support it, so no CPU probing is needed here
+_sha256 = hashlib.sha256
+
+# hashlib only releases the GIL for inputs over 2 KiB, so smaller batches hash faster inline
+_PARALLEL_HASH_MIN_ITEMS = 8
+_PARALLEL_HASH_MIN_BYTES = 64 * 1024
+
+# Column order of buffered rows, matching the INSERT/COPY column lists
+_FIELDS = (
+    'log_id', 'timestamp', 'event_type', 'user_id', 'inference_id', 'model_name',
+    'input_hash', 'output_hash', 'status', 'duration_ms', 'gpu_usage',
+    'ip_address', 'user_agent', 'metadata', 'pii_redacted'
+)
+_TIMESTAMP_COLUMN = 1
+_HASHED_COLUMNS = (6, 7)
+_JSON_COLUMNS = (10, 13)
+_PLAIN_COLUMNS = tuple(i for i in range(len(_FIELDS)) if i not in _JSON_COLUMNS)
+
+
+# Identical payloads recur across events (e.g. the same input for repeated inferences);
+# only small ones are memoized so the cache cannot pin large buffers in memory
+_HASH_CACHE_SIZE = 4096
+_HASH_CACHE_MAX_BYTES = 4096
+
+
+@functools.lru_cache(maxsize=_HASH_CACHE_SIZE)
+def _hash_bytes(blob: bytes) -> str:
+    return _sha256(blob).hexdigest()
+
+
+def _hexdigests(blobs: List[bytes]) -> List[str]:
+    return [
+        _hash_bytes(blob) if len(blob) <= _HASH_CACHE_MAX_BYTES else _sha256(blob).hexdigest()
+        for blob in blobs
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='audit-hash')
+
+
+def batch_sha256(blobs: List[bytes]) -> List[str]:
+    """Return the SHA-256 hex digest of each blob, hashing large batches on a thread pool"""
+    workers = os.cpu_count() or 1
+    if (workers == 1 or len(blobs) < _PARALLEL_HASH_MIN_ITEMS
+            or sum(map(len, blobs)) < _PARALLEL_HASH_MIN_BYTES):
+        return _hexdigests(blobs)
+
+    # One chunk per worker keeps executor overhead to a handful of tasks
+    step = -(-len(blobs) // workers)
+    chunks = [blobs[i:i + step] for i in range(0, len(blobs), step)]
+    return [digest for chunk in _hash_executor().map(_hexdigests, chunks) for digest in chunk]
+
+
+# Row values that are not read straight from the event data; every other column is data.get(<name>)
+_ROW_EXPRESSIONS = {
+    'log_id': 'log_id',
+    'timestamp': 'timestamp',
+    'event_type': 'event_type',
+    'user_id': 'user_id',
+    'input_hash': "serialize(get('input'))",
+    'output_hash': "serialize(get('output'))",
+    'gpu_usage': 'dumps(gpu_usage).decode() if gpu_usage else None',
+    'metadata': 'metadata_json',
+    'pii_redacted': 'pii_redacted',
+}
+
+
+def _make_row_builder_factory():
+    """Compile a row builder specialized for _FIELDS, with each column inlined as an expression"""
+    columns = ''.join(f"            {_ROW_EXPRESSIONS.get(field, f'get({field!r})')},\n" for field in _FIELDS)
+    source = (
+        "def make_row_builder(serialize, dumps):\n"
+        "    def build_row(data, event_type, user_id, log_id, timestamp, metadata_json, pii_redacted):\n"
+        "        get = data.get\n"
+        "        gpu_usage = get('gpu_usage')\n"
+        "        return (\n"
+        f"{columns}"
+        "        )\n"
+        "    return build_row\n"
+    )
+    namespace = {}
+    exec(compile(source, '<audit_logger row builder>', 'exec'), namespace)
+    return namespace['make_row_builder']
+
+
+# Called once per AuditLogger to bind its serializer into the generated builder
+_make_row_builder = _make_row_builder_factory()
+
+
+def _csv_field(value: Any) -> str:
+    """Encode a value for COPY ... (FORMAT csv), where only an unquoted empty field is NULL"""
+    if value is None:
+        return ''
+    # Quoting every value keeps CR/LF, commas and a literal "\N" inside the field
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _format_line(row: tuple) -> bytes:
+    """Render a hashed row as a JSON file-log line, splicing in the pre-serialized JSON columns"""
+    line = _dumps({_FIELDS[i]: row[i] for i in _PLAIN_COLUMNS})
+    json_columns = ''.join(f',"{_FIELDS[i]}":{row[i] or "null"}' for i in _JSON_COLUMNS)
+    return line[:-1] + json_columns.encode('utf-8') + b'}\n'
+
+
+if psycopg2 is not None:
+    class _AuditConnection(psycopg2.extensions.connection):
+        """psycopg2 connection that tracks whether the audit INSERT is prepared on it"""
+        insert_prepared = False
+
 
 class AuditLogger:
-    def __init__(self, db_config: Optional[Dict] = None, log_file: str = "audit.log"):
+    # Write queries name {table}, which is audit_logs or the staging table
+    insert_query = """
+    INSERT INTO {table} (
+        log_id, timestamp, event_type, user_id, inference_id, model_name,
+        input_hash, output_hash, status, duration_ms, gpu_usage,
+        ip_address, user_agent, metadata, pii_redacted
+    ) VALUES %s
+    """
+
+    insert_row_query = """
+    INSERT INTO {table} (
+        log_id, timestamp, event_type, user_id, inference_id, model_name,
+        input_hash, output_hash, status, duration_ms, gpu_usage,
+        ip_address, user_agent, metadata, pii_redacted
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+
+    # psycopg2 never prepares statements itself, so prepare the INSERT once per connection
+    prepare_query = """
+    PREPARE audit_insert (
+        varchar, timestamp, varchar, varchar, varchar, varchar,
+        varchar, varchar, varchar, integer, jsonb,
+        varchar, text, jsonb, boolean
+    ) AS
+    INSERT INTO {table} (
+        log_id, timestamp, event_type, user_id, inference_id, model_name,
+        input_hash, output_hash, status, duration_ms, gpu_usage,
+        ip_address, user_agent, metadata, pii_redacted
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
+    """
+
+    execute_query = "EXECUTE audit_insert (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+    copy_query = """
+    COPY {table} (
+        log_id, timestamp, event_type, user_id, inference_id, model_name,
+        input_hash, output_hash, status, duration_ms, gpu_usage,
+        ip_address, user_agent, metadata, pii_redacted
+    ) FROM STDIN
+    """
+
+    # Moves staged rows atomically, so rows staged meanwhile by other writers are kept
+    move_staged_query = """
+    WITH moved AS (
+        DELETE FROM audit_logs_stage RETURNING *
+    )
+    INSERT INTO audit_logs (
+        log_id, timestamp, event_type, user_id, inference_id, model_name,
+        input_hash, output_hash, status, duration_ms, gpu_usage,
+        ip_address, user_agent, metadata, pii_redacted
+    )
+    SELECT
+        log_id, timestamp, event_type, user_id, inference_id, model_name,
+        input_hash, output_hash, status, duration_ms, gpu_usage,
+        ip_address, user_agent, metadata, pii_redacted
+    FROM moved
+    """
+
+    def __init__(self, db_config: Optional[Dict] = None, log_file: str = "audit.log",
+                 buffer_limit: int = 1000, flush_interval: float = 1.0,
+                 use_psycopg3: bool = True, copy_threshold: Optional[int] = None,
+                 queue_size: int = 10000, pool_size: Optional[int] = None,
+                 stage_interval: Optional[float] = None):
         """
         Initialize the audit logger
         
         Args:
             db_config: Database configuration for persistent storage
-            log_file: File path for backup logging
+            log_file: File path for backup logging, written as one JSON object per line
+            buffer_limit: Number of buffered entries that triggers a database flush
+            flush_interval: Maximum age in seconds of buffered entries before a flush
+            use_psycopg3: Prefer psycopg 3 (pipelined, server-prepared inserts) when
+                psycopg and psycopg_pool are installed; otherwise fall back to psycopg2
+            copy_threshold: Flushes of at least this many entries use COPY instead of INSERT;
+                defaults to buffer_limit so every full-buffer flush uses COPY. Flushes
+                never exceed buffer_limit, so larger values disable COPY
+            queue_size: Maximum number of events waiting for the writer thread; log_event
+                blocks while the queue is full
+            pool_size: Maximum number of pooled database connections (default: CPU count, up to 8)
+            stage_interval: If set, flushes write to the UNLOGGED table audit_logs_stage,
+                whose rows are moved into audit_logs every stage_interval seconds and on
+                close(). Staged writes skip the WAL and audit_logs' indexes, but PostgreSQL
+                empties unlogged tables after a crash, so events staged since the last
+                move can be lost. Leave unset when every event must survive a crash.
         """
 
+        # The logger only reports the audit logger's own problems; audit events are
+        # appended to log_file directly, skipping logging's formatting and locking
         self.logger = logging.getLogger('audit_logger')
         self.logger.setLevel(logging.INFO)
-
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.INFO)
+        self._log_file = open(log_file, 'ab', buffering=1 << 20)
 
         self.db_config = db_config
-        self.db_connection = None
+        self.db_pool = None
+        self._pool_size = pool_size or min(8, os.cpu_count() or 1)
+        self._partitioned = False
+        self._partition_days = set()
+        self.db_available = False
+        self._use_psycopg3 = use_psycopg3 and psycopg is not None
 
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
+        # Events are handed to a writer thread, which batches them for file and database
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._buffer: List[tuple] = []
+        self._buffer_limit = buffer_limit
+        self._flush_interval = flush_interval
+        self._copy_threshold = copy_threshold or buffer_limit
+        self._stage_interval = stage_interval
 
-        self.logger.addHandler(file_handler)
+        # Resolve the write target once; the class attributes keep the templates
+        table = 'audit_logs_stage' if stage_interval else 'audit_logs'
+        for name in ('insert_query', 'insert_row_query', 'prepare_query', 'copy_query'):
+            setattr(self, name, getattr(AuditLogger, name).format(table=table))
+
+        # Writer-thread cache of the formatted timestamp up to whole seconds
+        self._ts_second = -1
+        self._ts_prefix = ''
+
+        self._uuid_lock = threading.Lock()
+        self._uuid_pool = b''
+        self._uuid_offset = _UUID_POOL_BYTES
+
+        self._build_row = _make_row_builder(self._serialize_sensitive_data, _dumps)
 
         if db_config:
             self._setup_database()
 
+        self._writer = threading.Thread(target=self._drain, name='audit-logger-writer', daemon=True)
+        self._writer.start()
+
+        # The writer is a daemon thread, so flush whatever is pending if close() is never called
+        atexit.register(self.close)
+
     def _setup_database(self):
         """Initialize database connection and create audit table if not exists""" 
 
         try:
-            self.db_connection = psycopg2.connect(**self.db_config)
-            cursor = self.db_connection.cursor()
+            if self._use_psycopg3:
+                self.db_pool = psycopg_pool.ConnectionPool(
+                    kwargs={**self.db_config, 'prepare_threshold': 5},
+                    min_size=1, max_size=self._pool_size, open=True
+                )
+                self.db_pool.wait(timeout=10.0)
+            elif psycopg2 is not None:
+                self.db_pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, self._pool_size, connection_factory=_AuditConnection, **self.db_config
+                )
+            else:
+                raise ImportError("neither psycopg nor psycopg2 is installed")
+            conn = self.db_pool.getconn()
+            cursor = conn.cursor()
 
+            # Append-only and time-ordered: partition by day and index the timestamp with BRIN.
+            # Keys of a partitioned table must include the partition column.
             create_table_query = """
             CREATE TABLE IF NOT EXISTS audit_logs (
-                id SERIAL PRIMARY KEY,
-                log_id VARCHAR(36) UNIQUE,
+                id SERIAL,
+                log_id VARCHAR(36),
                 timestamp TIMESTAMP NOT NULL,
                 event_type VARCHAR(50) NOT NULL,
                 user_id VARCHAR(100),
@@ -59,42 +363,154 @@ class AuditLogger:
                 user_agent TEXT,
                 metadata JSONB,
                 pii_redacted BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, timestamp),
+                UNIQUE (log_id, timestamp)
+            ) PARTITION BY RANGE (timestamp);
             
-            CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_logs(timestamp);
-            CREATE INDEX IF NOT EXISTS idx_audit_event_type ON audit_logs(event_type);
             CREATE INDEX IF NOT EXISTS idx_audit_user_id ON audit_logs(user_id);
-            CREATE INDEX IF NOT EXISTS idx_audit_inference_id ON audit_logs(inference_id);
             """
 
             cursor.execute(create_table_query)
-            self.db_connection.commit()
+
+            if self._stage_interval:
+                cursor.execute("""
+                CREATE UNLOGGED TABLE IF NOT EXISTS audit_logs_stage (
+                    log_id VARCHAR(36),
+                    timestamp TIMESTAMP NOT NULL,
+                    event_type VARCHAR(50) NOT NULL,
+                    user_id VARCHAR(100),
+                    inference_id VARCHAR(100),
+                    model_name VARCHAR(100),
+                    input_hash VARCHAR(64),
+                    output_hash VARCHAR(64),
+                    status VARCHAR(20),
+                    duration_ms INTEGER,
+                    gpu_usage JSONB,
+                    ip_address VARCHAR(45),
+                    user_agent TEXT,
+                    metadata JSONB,
+                    pii_redacted BOOLEAN DEFAULT FALSE
+                )
+                """)
+
+            # Tables created before partitioning was introduced are used as they are
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('audit_logs')")
+            self._partitioned = cursor.fetchone()[0] == 'p'
+            if self._partitioned:
+                cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_audit_timestamp_brin ON audit_logs
+                    USING BRIN (timestamp) WITH (pages_per_range = 32)
+                """)
+            conn.commit()
             cursor.close()
+            self._putconn(conn)
             
             self.db_available = True
             self.logger.info("Database setup complete")
 
 
-        except (Exception, psycopg2.Error) as e:
+        except Exception as e:
             self.logger.warning(f"⚠️ Database connection failed, using file logging only: {str(e)}")
             self.db_available = False
+            self._close_pool()
+
+    def _ensure_partitions(self, conn, rows: List[tuple]):
+        """Create the daily partitions for the rows and the day after, each in its own transaction"""
+        # Short separate transactions keep CREATE TABLE's lock on audit_logs out of the
+        # write itself; pre-creating the next day keeps midnight off the hot path
+        days = set()
+        for day in {row[_TIMESTAMP_COLUMN][:10] for row in rows}:
+            start = datetime.date.fromisoformat(day)
+            days.update((start, start + datetime.timedelta(days=1)))
+
+        cursor = conn.cursor()
+        for start in sorted(days - self._partition_days):
+            name = f'audit_logs_{start:%Y%m%d}'
+            try:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_logs "
+                    f"FOR VALUES FROM ('{start}') TO ('{start + datetime.timedelta(days=1)}')"
+                )
+                conn.commit()
+            except Exception:
+                # A concurrent writer may have created the same partition first
+                conn.rollback()
+                cursor.execute("SELECT to_regclass(%s)", (name,))
+                exists = cursor.fetchone()[0] is not None
+                conn.commit()
+                if not exists:
+                    raise
+            self._partition_days.add(start)
+        cursor.close()
+
+    def _putconn(self, conn, discard: bool = False):
+        """Return a connection to the pool, closing it instead if it may be unusable"""
+        if self._use_psycopg3:
+            # psycopg_pool rolls back or discards connections left in a failed state itself
+            self.db_pool.putconn(conn)
+        else:
+            self.db_pool.putconn(conn, close=discard)
+
+    def _close_pool(self):
+        """Close every pooled database connection"""
+        if self.db_pool is None:
+            return
+        if self._use_psycopg3:
+            self.db_pool.close()
+        else:
+            self.db_pool.closeall()
+        self.db_pool = None
+
+    def _serialize_sensitive_data(self, data: Any) -> Union[bytes, str, None]:
+        """
+        Serialize sensitive data to the canonical bytes that get hashed with SHA-256
 
-    def _hash_sensitive_data(self, data: Any) -> str:
-        """Hash sensitive data using SHA-256"""
+        NumPy arrays with a fixed-size dtype are hashed immediately from their raw
+        buffer, prefixed with dtype and shape, and returned as a hex digest so large
+        tensors are neither copied nor converted to JSON.
+        """
         if data is None:
             return None
-        data_str = json.dumps(data, sort_keys=True) if isinstance(data, ((dict, list))) else str
-        return hashlib.sha256(data_str.encode('utf-8')).hexdigest()
-
-    def _redact_pii(self, data: Dict) -> Dict:
-        """Redact PII from the log data"""
-        redacted_data = data.copy()
-        pii_fields = ['email', 'phone', 'address', 'name', 'ssn', 'credit_card', 'password']
-        for field in pii_fields:
-            if field in redacted_data:
-                redacted_data[field] = '[REDACTED]'
-        return redacted_data
+        if np is not None and isinstance(data, np.ndarray) and not data.dtype.hasobject:
+            hasher = _sha256(f'{data.dtype.str}{data.shape}'.encode('utf-8'))
+            hasher.update(np.ascontiguousarray(data).view(np.uint8))
+            return hasher.hexdigest()
+        if isinstance(data, (dict, list)):
+            return _dumps(data, sort=True)
+        return str(data).encode('utf-8')
+
+    def _new_log_id(self) -> str:
+        """Generate a random (version 4) UUID string from the pre-read urandom pool"""
+        with self._uuid_lock:
+            if self._uuid_offset >= _UUID_POOL_BYTES:
+                self._uuid_pool = os.urandom(_UUID_POOL_BYTES)
+                self._uuid_offset = 0
+            pool, offset = self._uuid_pool, self._uuid_offset
+            self._uuid_offset += 16
+        return str(uuid.UUID(bytes=pool[offset:offset + 16], version=4))
+
+    def _redact_pii(self, data: Any) -> Tuple[Any, bool]:
+        """Redact PII keys at any depth, returning the data and whether anything was redacted"""
+        if isinstance(data, dict):
+            redacted = {}
+            changed = False
+            for key, value in data.items():
+                if key in _PII_FIELDS:
+                    redacted[key] = '[REDACTED]'
+                    changed = True
+                else:
+                    redacted[key], value_changed = self._redact_pii(value)
+                    changed = changed or value_changed
+            return (redacted, True) if changed else (data, False)
+
+        # orjson serializes tuples as arrays too, so the key scan can match inside them
+        if isinstance(data, (list, tuple)):
+            results = [self._redact_pii(item) for item in data]
+            if any(changed for _, changed in results):
+                return [item for item, _ in results], True
+
+        return data, False
 
     def log_event(self, event_type: str, data: Dict, user_id: Optional[str] = None):
         """
@@ -106,83 +522,244 @@ class AuditLogger:
             user_id: User identifier (if available)
         """
 
+        if self._closed:
+            self.logger.error(f"Audit logger is closed, dropped {event_type} event")
+            return
+
         try:
-            # Generate unique log ID
-            log_id = str(uuid.uuid4())
-            timestamp = datetime.datetime.utcnow()
-            
-            # Redact PII from metadata
-            metadata = data.get('metadata', {})
-            redacted_metadata = self._redact_pii(metadata)
-            pii_redacted = metadata != redacted_metadata
-            
-            # Prepare log entry
-            log_entry = {
-                'log_id': log_id,
-                'timestamp': timestamp.isoformat(),
-                'event_type': event_type,
-                'user_id': user_id,
-                'inference_id': data.get('inference_id'),
-                'model_name': data.get('model_name'),
-                'input_hash': self._hash_sensitive_data(data.get('input')),
-                'output_hash': self._hash_sensitive_data(data.get('output')),
-                'status': data.get('status'),
-                'duration_ms': data.get('duration_ms'),
-                'gpu_usage': data.get('gpu_usage'),
-                'ip_address': data.get('ip_address'),
-                'user_agent': data.get('user_agent'),
-                'metadata': redacted_metadata,
-                'pii_redacted': pii_redacted
-            }
-            
-            # Log to file
-            self.logger.info(json.dumps(log_entry))
-            
-            # Store in database if configured
-            if self.db_available and self.db_connection:
-                self._store_in_database(log_entry)
-                
+            # Redact PII from metadata, walking it only if its JSON mentions a PII key
+            metadata = data.get('metadata')
+            metadata_json = _dumps(metadata).decode() if metadata else None
+            pii_redacted = False
+            if metadata_json is not None and _contains_pii_key(metadata_json):
+                metadata, pii_redacted = self._redact_pii(metadata)
+                if pii_redacted:
+                    metadata_json = _dumps(metadata).decode()
+
+            # Build the row in column order; the timestamp is formatted and input/output
+            # are hashed in one batch at flush time
+            row = self._build_row(
+                data, event_type, user_id, self._new_log_id(), time.time_ns(), metadata_json, pii_redacted
+            )
+
+            # File and database writes happen on the writer thread. The lock makes the
+            # closed check and the put atomic, so no row can land behind the stop marker
+            with self._close_lock:
+                if self._closed:
+                    self.logger.error(f"Audit logger is closed, dropped {event_type} event")
+                    return
+                self._queue.put(row)
+
         except Exception as e:
             self.logger.error(f"Failed to log event: {str(e)}")
 
-    def _store_in_database(self, log_entry: Dict):
-        """Store log entry in database"""
+    def _drain(self):
+        """Writer thread loop: batch queued rows and flush them by size or age"""
+        deadline = None
+        stage_deadline = time.monotonic() + self._stage_interval if self._stage_interval else None
+        while True:
+            wakeups = [d for d in (deadline, stage_deadline) if d is not None]
+            timeout = max(0.0, min(wakeups) - time.monotonic()) if wakeups else None
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+
+            if row is _STOP:
+                break
+            if row is not None:
+                if not self._buffer:
+                    deadline = time.monotonic() + self._flush_interval
+                self._buffer.append(row)
+
+            if len(self._buffer) >= self._buffer_limit or (
+                    deadline is not None and time.monotonic() >= deadline):
+                self._flush()
+                deadline = None
+
+            if stage_deadline is not None and time.monotonic() >= stage_deadline:
+                self._move_staged_rows()
+                stage_deadline = time.monotonic() + self._stage_interval
+
+        self._flush()
+        if self._stage_interval:
+            self._move_staged_rows()
+
+    def _flush(self):
+        """Hash all buffered log entries, then write them to file and database"""
+        if not self._buffer:
+            return
+
+        entries, self._buffer = self._buffer, []
         try:
-            cursor = self.db_connection.cursor()
-            
-            insert_query = """
-            INSERT INTO audit_logs (
-                log_id, timestamp, event_type, user_id, inference_id, model_name,
-                input_hash, output_hash, status, duration_ms, gpu_usage,
-                ip_address, user_agent, metadata, pii_redacted
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            cursor.execute(insert_query, (
-                log_entry['log_id'],
-                log_entry['timestamp'],
-                log_entry['event_type'],
-                log_entry['user_id'],
-                log_entry['inference_id'],
-                log_entry['model_name'],
-                log_entry['input_hash'],
-                log_entry['output_hash'],
-                log_entry['status'],
-                log_entry['duration_ms'],
-                json.dumps(log_entry['gpu_usage']) if log_entry['gpu_usage'] else None,
-                log_entry['ip_address'],
-                log_entry['user_agent'],
-                json.dumps(log_entry['metadata']) if log_entry['metadata'] else None,
-                log_entry['pii_redacted']
-            ))
-            
-            self.db_connection.commit()
+            rows = self._prepare_rows(entries)
+        except Exception as e:
+            self.logger.error(f"Failed to prepare {len(entries)} audit events: {str(e)}")
+            return
+
+        # Format each line on its own so one unserializable event only drops itself
+        lines = []
+        valid_rows = []
+        for row in rows:
+            try:
+                lines.append(_format_line(row))
+            except Exception as e:
+                self.logger.error(f"Failed to log event {row[0]}: {str(e)}")
+                continue
+            valid_rows.append(row)
+        rows = valid_rows
+
+        # Log to file
+        try:
+            self._log_file.writelines(lines)
+            self._log_file.flush()
+        except Exception as e:
+            self.logger.error(f"Failed to write {len(lines)} audit events to file: {str(e)}")
+
+        # Store in database if configured
+        if self.db_available:
+            self._store_in_database(rows)
+
+    def _prepare_rows(self, entries: List[tuple]) -> List[tuple]:
+        """Format timestamps and replace serialized input/output payloads with their hashes"""
+        blobs = [entry[i] for entry in entries for i in _HASHED_COLUMNS if isinstance(entry[i], bytes)]
+        digests = iter(batch_sha256(blobs))
+        rows = []
+        for entry in entries:
+            row = list(entry)
+            row[_TIMESTAMP_COLUMN] = self._format_timestamp(entry[_TIMESTAMP_COLUMN])
+            for i in _HASHED_COLUMNS:
+                if isinstance(row[i], bytes):
+                    row[i] = next(digests)
+            rows.append(tuple(row))
+        return rows
+
+    def _format_timestamp(self, timestamp_ns: int) -> str:
+        """Format epoch nanoseconds as a UTC ISO 8601 string, reusing the cached seconds prefix"""
+        seconds, nanoseconds = divmod(timestamp_ns, 1_000_000_000)
+        if seconds != self._ts_second:
+            self._ts_second = seconds
+            self._ts_prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))
+        return f'{self._ts_prefix}.{nanoseconds // 1000:06d}'
+
+    def _store_in_database(self, rows: List[tuple]):
+        """Write hashed rows to the database, falling back to one transaction per row on failure"""
+        conn = None
+        failed = False
+        try:
+            conn = self.db_pool.getconn()
+            if self._partitioned:
+                self._ensure_partitions(conn, rows)
+            try:
+                self._write_batch(conn, rows)
+            except Exception as e:
+                if conn.closed:
+                    raise
+                # One bad event should not take the rest of the batch down with it
+                conn.rollback()
+                self.logger.warning(f"Batch write failed, retrying {len(rows)} entries one by one: {str(e)}")
+                failed = not self._store_rows_individually(conn, rows)
+
+        except Exception as e:
+            failed = True
+            self.logger.error(f"Database storage failed, dropped {len(rows)} entries: {str(e)}")
+
+        finally:
+            if conn is not None:
+                self._putconn(conn, discard=failed)
+
+    def _write_batch(self, conn, rows: List[tuple]):
+        """Write rows in a single transaction using the fastest path for the batch size"""
+        cursor = conn.cursor()
+        if len(rows) >= self._copy_threshold:
+            try:
+                self._bulk_copy(cursor, rows)
+                conn.commit()
+                cursor.close()
+                return
+            except Exception as e:
+                if conn.closed:
+                    raise
+                # COPY rejects input an INSERT would coerce, e.g. 12.5 for the integer duration_ms
+                conn.rollback()
+                self.logger.warning(f"COPY failed, retrying {len(rows)} entries with INSERT: {str(e)}")
+
+        if self._use_psycopg3:
+            # Send every INSERT without waiting for the previous result
+            with conn.pipeline():
+                cursor.executemany(self.insert_row_query, rows)
+        elif len(rows) < _PREPARED_MAX_ROWS:
+            if not conn.insert_prepared:
+                cursor.execute(self.prepare_query)
+                conn.insert_prepared = True
+            psycopg2.extras.execute_batch(cursor, self.execute_query, rows)
+        else:
+            psycopg2.extras.execute_values(cursor, self.insert_query, rows, page_size=500)
+        conn.commit()
+        cursor.close()
+
+    def _store_rows_individually(self, conn, rows: List[tuple]) -> bool:
+        """Insert rows one transaction at a time, dropping only the rows that fail.
+
+        Returns False if the connection was lost and the remaining rows were dropped.
+        """
+        cursor = conn.cursor()
+        for i, row in enumerate(rows):
+            try:
+                cursor.execute(self.insert_row_query, row)
+                conn.commit()
+            except Exception as e:
+                if conn.closed:
+                    self.logger.error(f"Database storage failed, dropped {len(rows) - i} entries: {str(e)}")
+                    return False
+                conn.rollback()
+                self.logger.error(f"Database storage failed for event {row[0]}: {str(e)}")
+        cursor.close()
+        return True
+
+    def _move_staged_rows(self):
+        """Move rows from the unlogged staging table into audit_logs in one transaction"""
+        if not self.db_available:
+            return
+
+        conn = None
+        failed = False
+        try:
+            conn = self.db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute(self.move_staged_query)
+            conn.commit()
             cursor.close()
-            
+
         except Exception as e:
-            self.logger.error(f"Database storage failed: {str(e)}")
+            failed = True
+            self.logger.error(f"Moving staged audit events failed: {str(e)}")
+
+        finally:
+            if conn is not None:
+                self._putconn(conn, discard=failed)
+
+    def _bulk_copy(self, cursor, rows: List[tuple]):
+        """Stream rows into the database with COPY, skipping per-row SQL parsing"""
+        if self._use_psycopg3:
+            with cursor.copy(self.copy_query) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            return
+
+        # psycopg2 has no row writer, so encode the batch as CSV
+        payload = io.StringIO(''.join(','.join(map(_csv_field, row)) + '\n' for row in rows))
+        cursor.copy_expert(self.copy_query + "WITH (FORMAT csv)", payload)
     
     def close(self):
-        """Clean up resources"""
-        if self.db_connection:
-            self.db_connection.close()
\ No newline at end of file
+        """Flush pending events, stop the writer thread and clean up resources"""
+        with self._close_lock:
+            self._closed = True
+            if self._writer.is_alive():
+                self._queue.put(_STOP)
+        atexit.unregister(self.close)
+        self._writer.join()
+        self._close_pool()
+        if not self._log_file.closed:
+            os.fsync(self._log_file.fileno())
+            self._log_file.close()
\ No newline at end of file